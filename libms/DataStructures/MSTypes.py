@@ -318,6 +318,9 @@ class PeakMap(object):
         if rtmax is None:
             rtmax = self.spectra[-1].rt
         specs = self.levelNSpecsInRange(n, rtmin, rtmax)
+        # peaks of a single spectrum are already sorted:
+        if len(specs) == 1:
+            return specs[0].peaks.copy()
         # following vstack does not like empty sequence, so:
         if len(specs):
             peaks = np.vstack([s.peaks for s in specs])
@@ -821,7 +821,8 @@ class Table(object):
         rv = self._addColumnWithoutNameCheck(name+"__tmp", what, type_, format_,\
                             insertBefore=name)
         self.dropColumns(name)
-        self.renameColumns(**{name+"__tmp": name})
+        # name may have a postfix as "__0", which renameColumns rejects:
+        self._renameColumnsUnchecked(**{name+"__tmp": name})
         return rv
 
     def _updateColumnWithoutNameCheck(self, name, what, type_=None, format_="",
@@ -4,10 +4,20 @@ class TableParser(object):
 
     @classmethod
     def parse(clz, lines):
-        columnNames = [ n.strip('"') for n in lines[0].split() ]
+        return clz._parse(iter(lines))
+
+    @classmethod
+    def parseFile(clz, path):
+        """ parses file line by line without reading it into memory first """
+        with open(path, "r") as fp:
+            return clz._parse(fp)
+
+    @classmethod
+    def _parse(clz, lines):
+        columnNames = [ n.strip('"') for n in next(lines).split() ]
         numCol = len(columnNames)
         rows = []
-        for line in lines[1:]:
+        for line in lines:
             row= [Table.bestConvert(c) for c in line.split()[1:]]
             rows.append(row)
 
@@ -124,8 +124,8 @@ class ModifiedCurvePlot(CurvePlot):
     def do_pan_view(self, dx, dy):
         """ modified do_zoom_view such that only panning in x-direction happens """
 
-        dy = dy[2], dy[2], dy[2], dy[3]
-        return super(ModifiedCurvePlot, self).do_pan_view(dx, dy)
+        y = dy[2]
+        return super(ModifiedCurvePlot, self).do_pan_view(dx, (y, y, y, dy[3]))
 
 
     @protect_signal_handler
@@ -139,12 +139,15 @@ class ModifiedCurvePlot(CurvePlot):
                 yield item
 
     def get_unique_item(self, clz):
-        items = set(self.get_items_of_class(clz))
-        if len(items) == 0:
+        # called on every mouse move, so we do not collect the items:
+        items = self.get_items_of_class(clz)
+        item = next(items, None)
+        if item is None:
             return None
-        if len(items) != 1:
-            raise Exception("%d instance(s) of %s among CurvePlots items !" % (len(items), clz))
-        return items.pop()
+        n = 1 + sum(1 for __ in items)
+        if n != 1:
+            raise Exception("%d instance(s) of %s among CurvePlots items !" % (n, clz))
+        return item
 
 
     def set_limit(self, ix, value):
@@ -153,19 +156,21 @@ class ModifiedCurvePlot(CurvePlot):
         self.set_plot_limits(*limits)
 
     def reset_x_limits(self, xmin=None, xmax=None, fac=1.0):
-        xvals = []
+        mins, maxs = [], []
         for item in self.items:
             if isinstance(item, CurveItem):
                 x, _ = item.get_data()
-                xvals.extend(list(x))
+                if len(x):
+                    mins.append(np.min(x))
+                    maxs.append(np.max(x))
         if xmin is None:
-            if len(xvals):
-                xmin = min(xvals)/fac
+            if mins:
+                xmin = min(mins)/fac
             else:
                 xmin = 0
         if xmax is None:
-            if len(xvals):
-                xmax = max(xvals)*fac
+            if maxs:
+                xmax = max(maxs)*fac
             else:
                 xmax = 1.0
         self.update_plot_xlimits(xmin, xmax)
@@ -308,13 +313,18 @@ class MzPlot(ModifiedCurvePlot):
         if self.all_peaks.shape[0] == 0: 
             return mz,I
 
-        all_peaks = self.all_peaks-np.array((mz,I))
-
         # scale according to zooms axis proportions:
         mzmin, mzmax, Imin, Imax = self.get_plot_limits()
-        all_peaks /= np.array((mzmax-mzmin, Imax-Imin))
-        # find minimal distacne
-        distances = all_peaks[:,0] ** 2 + all_peaks[:,1]** 2
+
+        # find minimal distance, we work in place to avoid temporary
+        # arrays as this is called for every mouse move:
+        distances = self.all_peaks[:,0] - mz
+        distances /= mzmax-mzmin
+        distances *= distances
+        dI = self.all_peaks[:,1] - I
+        dI /= Imax-Imin
+        dI *= dI
+        distances += dI
         imin = np.argmin(distances)
         return self.all_peaks[imin]
 
@@ -431,15 +441,32 @@ class ModifiedSegment(SegmentShape):
             painter.drawPolyline(other_points)
 
 
+def _nearest_index(xvals, x):
+    """ index of value in sorted array xvals which is closest to x """
+    idx = np.searchsorted(xvals, x)
+    if idx == 0:
+        return 0
+    if idx == len(xvals):
+        return idx - 1
+    if x - xvals[idx-1] <= xvals[idx] - x:
+        return idx - 1
+    return idx
+
+
 class SnappingRangeSelection(XRangeSelection):
 
     """ modification:
             - only limit bars can be moved
             - snaps to given rt-values which are in general not equally spaced
+
+        snapping relies on get_xvals() returning a sorted array.
     """
 
     def __init__(self, min_, max_, xvals):
         super(SnappingRangeSelection, self).__init__(min_, max_)
+        # the snap targets are known when the selection is created, so we
+        # sort them only once:
+        self._xvals = np.sort(xvals) if xvals is not None else None
 
     def move_local_point_to(self, hnd, pos, ctrl=None):
         """ had to rewrite this function as the orginal does not give
@@ -449,6 +476,8 @@ class SnappingRangeSelection(XRangeSelection):
         self.move_point_to(hnd, (val, 0), ctrl)
 
     def get_xvals(self):
+        if self._xvals is not None:
+            return self._xvals
         xvals = []
         for item in self.plot().get_items():
             if isinstance(item, CurveItem):
@@ -463,8 +492,7 @@ class SnappingRangeSelection(XRangeSelection):
         # fast enough
         if len(xvals) > 0:
             val, y = pos
-            imin = np.argmin(np.fabs(val-xvals))
-            x = xvals[imin]
+            x = xvals[_nearest_index(xvals, val)]
 
         if self._min == self._max and not ctrl:
             self._min = x
@@ -486,10 +514,9 @@ class SnappingRangeSelection(XRangeSelection):
         """ used for moving boundaries """
 
         xvals = self.get_xvals()
-        imin = np.argmin(np.fabs(x-xvals))
-        if imin == 0: return xvals[0], xvals[1]
-        if imin == len(xvals)-1 : return xvals[imin-1], xvals[imin]
-        return xvals[imin-1], xvals[imin+1]
+        imin = _nearest_index(xvals, x)
+        # at the boundaries the nearest value itself is the neighbour:
+        return xvals[max(imin-1, 0)], xvals[min(imin+1, len(xvals)-1)]
 
     def move_shape(self, old_pos, new_pos):
         # disabled, that is: do nothing !
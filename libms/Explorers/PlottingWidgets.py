@@ -11,7 +11,7 @@ from Config import setupStyleRangeMarker, setupCommonStyle, setupStyleRtMarker
 from PyQt4.Qwt5 import QwtScaleDraw, QwtText
 
 import numpy as np
-import new
+import weakref
 
 from ..gui.helpers import protect_signal_handler
 
@@ -23,6 +23,59 @@ def getColor(i):
 def formatSeconds(seconds):
     return "%.2fm" % (seconds/60.0)
 
+def decimate(x, y, target=2000):
+    """ reduces (x, y) to about target points by keeping the minimum and
+        the maximum of y in each bucket, so spikes remain visible.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n = x.shape[0]
+    if n <= target:
+        return x, y
+    # two points per bucket:
+    k = int(np.ceil(2.0 * n / target))
+    nb = int(np.ceil(float(n) / k))
+    padded = np.empty((nb * k,), dtype=y.dtype)
+    padded[:n] = y
+    # repeating the last value does not change min/max of the last bucket:
+    padded[n:] = y[-1]
+    buckets = padded.reshape(nb, k)
+    offsets = np.arange(nb) * k
+    imin = offsets + buckets.argmin(axis=1)
+    imax = offsets + buckets.argmax(axis=1)
+    # keep end points, so x-range of the data does not change:
+    idx = np.unique(np.concatenate(((0, n-1), imin, imax)))
+    return x[idx], y[idx]
+
+class _CachingScaleDraw(QwtScaleDraw):
+    """ renders tic labels with self.format, tic values repeat across
+        redraws, so the labels are cached.
+    """
+
+    MAX_CACHE_SIZE = 1000
+
+    def __init__(self):
+        QwtScaleDraw.__init__(self)
+        self._cache = dict()
+
+    def label(self, v):
+        txt = self._cache.get(v)
+        if txt is None:
+            if len(self._cache) > self.MAX_CACHE_SIZE:
+                self._cache.clear()
+            txt = self._cache[v] = QwtText(self.format(v))
+        return txt
+
+class SecondsScaleDraw(_CachingScaleDraw):
+
+    def format(self, v):
+        return formatSeconds(v)
+
+class PlainScaleDraw(_CachingScaleDraw):
+
+    def format(self, v):
+        return "%s" % v
+
 class RtRangeSelectionInfo(ObjectInfo):
 
     def __init__(self, range_):
@@ -88,14 +141,8 @@ class RtPlotter(PlotterBase):
         widget = self.widget
         widget.plot.__class__ = RtPlot
 
-        # todo: refactor as helper
-        a = QwtScaleDraw()
         # render tic labels in modfied format:
-        label = lambda self, v: QwtText(formatSeconds(v))
-        a.label = new.instancemethod(label, widget.plot, QwtScaleDraw)
-        widget.plot.setAxisScaleDraw(widget.plot.xBottom, a)
-
-        #a.label = new.instancemethod(label, widget.plot, QwtScaleDraw)
+        widget.plot.setAxisScaleDraw(widget.plot.xBottom, SecondsScaleDraw())
 
         self.pm = PlotManager(widget)
         self.pm.add_plot(widget.plot)
@@ -128,31 +175,38 @@ class RtPlotter(PlotterBase):
         self.replot()
 
     def plot(self, chromatograms, titles=None, configs=None,\
-                   withmarker=False):
-        """ do not forget to call replot() after calling this function ! """
-        allrts = set()
+                   withmarker=False, rts=None):
+        """ do not forget to call replot() after calling this function !
+
+            ``rts`` are the values the marker and the range selection snap
+            to, default are the rts of all chromatograms.
+        """
+        rts_arrays = []
         self.widget.plot.del_all_items()
         #self.widget.plot.set_antialiasing(True)
-        for i in range(len(chromatograms)):
-            rts, chromatogram = chromatograms[i]
-            config = None
-            if configs is not None:
-                config = configs[i]
+        n = len(chromatograms)
+        items = zip(chromatograms, titles or [""] * n, configs or [None] * n)
+        for i, ((crts, chromatogram), title, config) in enumerate(items):
             if config is None:
                 config = dict(color = getColor(i))
-            if titles:
-                title = titles[i]
-            else:
-                title = ""
 
-            curve = make.curve(rts, chromatogram, title=title, **config)
+            curve = make.curve(crts, chromatogram, title=title, **config)
             curve.__class__ = ModifiedCurveItem
-            allrts.update(rts)
+            rts_arrays.append(np.asarray(crts))
             self.widget.plot.add_item(curve)
 
+        # rts of a single chromatogram are already sorted and unique:
+        if rts is not None:
+            allrts = np.asarray(rts)
+        elif len(rts_arrays) == 0:
+            allrts = np.zeros((0,))
+        elif len(rts_arrays) == 1:
+            allrts = rts_arrays[0]
+        else:
+            allrts = np.unique(np.concatenate(rts_arrays))
+
         if withmarker:
             self.widget.plot.add_item(self.label)
-            allrts = sorted(allrts)
             self.marker.rts = allrts
             self.marker.attach(self.widget.plot)
             self.widget.plot.add_item(self.marker)
@@ -209,20 +263,31 @@ class RtPlotter(PlotterBase):
             self.rangeSelectionCallback()
 
 class MzCursorInfo(ObjectInfo):
+
+    TEMPLATE = "mz=%.6f<br/>I=%.1e"
+    TEMPLATE_WITH_LINE = TEMPLATE + "<br/><br/>dmz=%.6f<br/>rI=%.3e<br/>mean=%.6f"
+
     def __init__(self, marker, line):
         ObjectInfo.__init__(self)
         self.marker = marker
         self.line   = line
+        self._label_ref = lambda: None
+
+    def set_label(self, label):
+        # weak reference, as the label holds a reference to this object:
+        self._label_ref = weakref.ref(label)
 
     def get_text(self):
+        # called on every mouse move, so skip formatting if nobody sees it:
+        label = self._label_ref()
+        if label is not None and not label.isVisible():
+            return ""
         mz, I = self.marker.xValue(), self.marker.yValue()
-        txt = "mz=%.6f<br/>I=%.1e" % (mz, I)
         if self.line.isVisible():
             _, _ , mz2, I2 = self.line.get_rect()
             mean = (mz+mz2)/2.0
-            txt += "<br/><br/>dmz=%.6f<br/>rI=%.3e<br/>mean=%.6f" % (mz2-mz, I2/I, mean)
-
-        return txt
+            return self.TEMPLATE_WITH_LINE % (mz, I, mz2-mz, I2/I, mean)
+        return self.TEMPLATE % (mz, I)
 
 
 
@@ -241,11 +306,7 @@ class MzPlotter(PlotterBase):
         self.setHalfWindowWidth(0.05)
         self.centralMz = None
 
-        # todo: refactor as helper
-        a = QwtScaleDraw()
-        label = lambda self, x : QwtText("%s" % x)
-        a.label = new.instancemethod(label, widget.plot, QwtScaleDraw)
-        widget.plot.setAxisScaleDraw(widget.plot.xBottom, a)
+        widget.plot.setAxisScaleDraw(widget.plot.xBottom, PlainScaleDraw())
 
         self.pm = PlotManager(widget)
         self.pm.add_plot(widget.plot)
@@ -269,8 +330,10 @@ class MzPlotter(PlotterBase):
 
         setupCommonStyle(line, marker)
 
-        label = make.info_label("TR", [MzCursorInfo(marker, line)], title=None)
+        cursorInfo = MzCursorInfo(marker, line)
+        label = make.info_label("TR", [cursorInfo], title=None)
         label.labelparam.label = ""
+        cursorInfo.set_label(label)
 
         self.marker = marker
         self.label = label
@@ -295,24 +358,29 @@ class MzPlotter(PlotterBase):
         self.widget.plot.add_item(self.label)
 
         allpeaks = []
-        for i in range(len(spectra)):
-            peaks = spectra[i]
+        n = len(spectra)
+        items = zip(spectra, titles or [u""] * n, configs or [None] * n)
+        for i, (peaks, title, config) in enumerate(items):
             allpeaks.append(peaks)
-            config = configs[i] if configs is not None else None
             if config is None:
                 config = dict(color = getColor(i))
-            if titles is not None:
-                title = titles[i]
-            else:
-                title = u""
             curve = make.curve([], [], title=title,\
                               curvestyle="Sticks", **config)
-            curve.set_data(peaks[:, 0], peaks[:, 1])
+            # intensities are only painted, single precision is sufficient:
+            curve.set_data(peaks[:, 0], peaks[:, 1].astype(np.float32))
             curve.__class__ = ModifiedCurveItem
             self.widget.plot.add_item(curve)
         self.widget.plot.add_item(self.line)
-        if len(allpeaks):
-            self.widget.plot.all_peaks = np.vstack(allpeaks)
+        if len(allpeaks) == 1:
+            self.widget.plot.all_peaks = allpeaks[0]
+        elif len(allpeaks):
+            total = sum(p.shape[0] for p in allpeaks)
+            all_peaks = np.empty((total, 2), dtype=allpeaks[0].dtype)
+            offset = 0
+            for p in allpeaks:
+                all_peaks[offset:offset+p.shape[0]] = p
+                offset += p.shape[0]
+            self.widget.plot.all_peaks = all_peaks
         else:
             self.widget.plot.all_peaks = np.zeros((0,2))
 
@@ -3,13 +3,13 @@
 from PyQt4.QtGui import  (QVBoxLayout, QDialog, QLabel, QLineEdit,\
                           QPushButton, QHBoxLayout, QComboBox)
 
-from PyQt4.QtCore import Qt, SIGNAL
+from PyQt4.QtCore import Qt, SIGNAL, QTimer
 
-import guidata
 import os
+from collections import OrderedDict
 
 
-from PlottingWidgets import RtPlotter, MzPlotter
+from PlottingWidgets import RtPlotter, MzPlotter, decimate
 import numpy as np
 
 from ..gui.helpers import protect_signal_handler
@@ -45,13 +45,27 @@ class MzExplorer(QDialog):
 
         self.peakmap = pm.getDominatingPeakmap()
 
-        self.rts = np.array([s.rt for s in self.peakmap.spectra])
+        spectra = self.peakmap.spectra
+        self.rts = np.fromiter((s.rt for s in spectra), dtype=np.float64,
+                               count=len(spectra))
+        # spectra are usually in acquisition order, then we can look up
+        # rt ranges by bisection:
+        self._rtsSorted = bool(np.all(self.rts[1:] >= self.rts[:-1]))
+        # merged peaks of recently shown rt ranges, keyed by spectra indices:
+        self._peaksCache = OrderedDict()
+
+        # views, not copies:
+        self._peaks_mz = [ s.peaks[:,0] for s in spectra ]
+        self._peaks_I = [ s.peaks[:,1] for s in spectra ]
+        maxPeaks = max([ mz.size for mz in self._peaks_mz ] or [0])
+        self._maskBuffer = np.empty((maxPeaks,), dtype=bool)
 
         mzvals = np.hstack([ spec.peaks[:,0] for spec in pm.spectra ])
         self.absMinMZ = np.min(mzvals)
         self.absMaxMZ = np.max(mzvals)
         self.minMZ = self.absMinMZ
         self.maxMZ = self.absMaxMZ
+        self._tic = None
         self.updateChromatogram()
 
         title = os.path.basename(pm.meta.get("source", ""))
@@ -59,12 +73,30 @@ class MzExplorer(QDialog):
 
     def updateChromatogram(self):
         min_, max_ = self.minMZ, self.maxMZ
-        cc =[np.sum(spec.peaks[(spec.peaks[:,0] >= min_)\
-                              *(spec.peaks[:,0] <= max_)][:, 1])\
-             for spec in self.peakmap.spectra]
-        self.chromatogram = np.array(cc)
+        if min_ <= self.absMinMZ and max_ >= self.absMaxMZ:
+            # all peaks are in range, this is the total ion chromatogram
+            # which does not change, so we compute it only once:
+            if self._tic is None:
+                self._tic = np.fromiter((I.sum() for I in self._peaks_I),
+                                        dtype=np.float64,
+                                        count=len(self._peaks_I))
+            self.chromatogram = self._tic
+            return
+        cc = np.zeros((len(self._peaks_mz),))
+        for i, (mz, I) in enumerate(zip(self._peaks_mz, self._peaks_I)):
+            m = self._maskBuffer[:mz.size]
+            np.greater_equal(mz, min_, out=m)
+            np.logical_and(m, mz <= max_, out=m)
+            cc[i] = np.dot(m, I)
+        self.chromatogram = cc
 
     def connectSignalsAndSlots(self):
+        # dragging the rt range emits many range changes, we plot the
+        # spectrum at most every 16 ms:
+        self._plotMzTimer = QTimer(self)
+        self._plotMzTimer.setSingleShot(True)
+        self._plotMzTimer.setInterval(16)
+        self.connect(self._plotMzTimer, SIGNAL("timeout()"), self._doPlotMz)
         self.connect(self.selectButton, SIGNAL("clicked()"), self.selectButtonPressed)
         self.connect(self.resetButton, SIGNAL("clicked()"), self.resetButtonPressed)
         self.connect(self.inputW2, SIGNAL("textEdited(QString)"), self.w2Updated)
@@ -81,8 +113,15 @@ class MzExplorer(QDialog):
         self.updateChromatogram()
         self.plotChromatogramm()
 
+    @protect_signal_handler
+    def _doPlotMz(self):
+        self.plotMz()
+
     @protect_signal_handler
     def levelNSpecChosen(self, idx):
+        if idx == self._lastLevelNIdx:
+            return
+        self._lastLevelNIdx = idx
         if idx == 0:
             self.plotMz()
         else:
@@ -134,6 +173,7 @@ class MzExplorer(QDialog):
         self.resetButton.setText("Reset")
         self.inputW2.setText("0.05")
 
+        self._lastLevelNIdx = 0
         if len(self.levelNSpecs):
             self.chooseLevelNSpec = QComboBox()
             self.chooseLevelNSpec.addItem("Only Level 1 Spectra")
@@ -163,7 +203,7 @@ class MzExplorer(QDialog):
         self.inputMZ.setText("%.6f" % mz)
 
     def setupPlotWidgets(self):
-        self.rtPlotter = RtPlotter(self.plotMz)
+        self.rtPlotter = RtPlotter(self.rtRangeChanged)
         self.mzPlotter = MzPlotter(self.handleCPressed)
 
         self.rtPlotter.setMinimumSize(600, 300)
@@ -171,21 +211,55 @@ class MzExplorer(QDialog):
 
         self.mzPlotter.setHalfWindowWidth(0.05)
 
+    def rtRangeChanged(self):
+        if not self._plotMzTimer.isActive():
+            self._plotMzTimer.start()
+
     def plotChromatogramm(self):
-        self.rtPlotter.plot([(self.rts, self.chromatogram)])
+        # the screen has not more pixels than that, so plot less points:
+        rts, chromatogram = decimate(self.rts, self.chromatogram)
+        # single precision is enough for painting intensities:
+        chromatogram = chromatogram.astype(np.float32)
+        # the range selection has to snap to all spectra, not only to the
+        # painted points:
+        self.rtPlotter.plot([(rts, chromatogram)], rts=self.rts)
         self.rtPlotter.setXAxisLimits(self.rts[0], self.rts[-1])
         self.rtPlotter.setYAxisLimits(0, max(self.chromatogram)*1.1)
         self.rtPlotter.setRangeSelectionLimits(self.rts[0], self.rts[0])
         self.rtPlotter.replot()
 
     def plotMz(self):
+        # a pending update would plot the same range again:
+        self._plotMzTimer.stop()
         minRT = self.rtPlotter.minRTRangeSelected
         maxRT = self.rtPlotter.maxRTRangeSelected
-        peaks = self.peakmap.ms1Peaks(minRT, maxRT)
+        peaks = self.ms1PeaksInRange(minRT, maxRT)
         self.mzPlotter.resetAxes()
         self.mzPlotter.plot([peaks])
         self.mzPlotter.replot()
 
+    def ms1PeaksInRange(self, minRT, maxRT):
+        if not self._rtsSorted or minRT is None or maxRT is None:
+            return self.peakmap.msNPeaks(1, minRT, maxRT)
+        # same limits as PeakMap.levelNSpecsInRange:
+        lo = np.searchsorted(self.rts, minRT-1e-2, "left")
+        hi = np.searchsorted(self.rts, maxRT+1e-2, "right")
+        peaks = [s.peaks for s in self.peakmap.spectra[lo:hi] if s.msLevel == 1]
+        if len(peaks) == 0:
+            return np.zeros((0,2), dtype=float)
+        if len(peaks) == 1:
+            return peaks[0]
+        key = (lo, hi)
+        merged = self._peaksCache.pop(key, None)
+        if merged is None:
+            merged = np.vstack(peaks)
+            merged = merged[np.argsort(merged[:,0]),:]
+            if len(self._peaksCache) >= 8:
+                self._peaksCache.popitem(last=False)
+        # most recently used entry is last:
+        self._peaksCache[key] = merged
+        return merged
+
 
 def inspectPeakMap(peakmap):
     """
@@ -195,6 +269,7 @@ def inspectPeakMap(peakmap):
     if len(peakmap) == 0:
         raise Exception("empty peakmap")
 
+    import guidata
     app = guidata.qapplication() # singleton !
     win = MzExplorer()
     win.setup(peakmap)
@@ -203,5 +278,8 @@ def inspectPeakMap(peakmap):
     del win.peakmap
     del win.levelNSpecs
     del win.rts
+    del win._peaks_mz
+    del win._peaks_I
+    del win._peaksCache
 
 
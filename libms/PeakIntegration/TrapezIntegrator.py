@@ -1,4 +1,5 @@
 from PeakIntegrator import PeakIntegrator
+import numpy as np
 
 class TrapezIntegrator(PeakIntegrator):
 
@@ -7,14 +8,7 @@ class TrapezIntegrator(PeakIntegrator):
 
     def integrator(self, allrts, fullchromatogram, rts, chromatogram):
 
-        if len(rts) == 2:
-            area = 0.5 * (chromatogram[0]+chromatogram[1])*(rts[1]-rts[0])
-            return area, 0.0, (rts, chromatogram)
-
-        if len(rts) == 1:
-            return 0.0, 0.0, (rts, chromatogram)
-
-        area = self.trapez(rts, chromatogram)
+        area = float(np.trapz(chromatogram, rts)) if len(rts) >= 2 else 0.0
         return area, 0.0, (rts, chromatogram)
 
     def _getSmoothed(self, rtvalues, params):
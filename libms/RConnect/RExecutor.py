@@ -2,6 +2,7 @@
 import os, glob, subprocess, sys, re
 
 import userConfig
+from config_logger import memoize
 
 
 from ..intern_utils import TemporaryDirectoryWithBackup
@@ -26,14 +27,16 @@ class RExecutor(object):
             self.rExe = "R"
 
     @staticmethod
+    @memoize
     def findRHome():
         assert sys.platform == "win32"
         import _winreg
         pathToR = None
+        # cheapest lookup first, registry queries are slow:
         for finder in [
+                       lambda : os.environ.get("R_HOME"),
                        lambda : RExecutor.path_from(_winreg.HKEY_CURRENT_USER),
                        lambda : RExecutor.path_from(_winreg.HKEY_LOCAL_MACHINE),
-                       lambda : os.environ.get("R_HOME"),
                        RExecutor.parse_path_variable,
                        ]:
             try:
@@ -47,6 +50,7 @@ class RExecutor(object):
         return pathToR
 
     @staticmethod
+    @memoize
     def findRExe(rHome):
 
         found = glob.glob("%s/bin/x64/R.exe" % rHome)
@@ -58,14 +62,19 @@ class RExecutor(object):
 
     @staticmethod
     def parse_path_variable():
-        for path in os.environ.get("PATH","").split(os.pathsep):
+        return RExecutor._parse_path(os.environ.get("PATH",""))
+
+    @staticmethod
+    @memoize
+    def _parse_path(pathVariable):
+        for path in pathVariable.split(os.pathsep):
             # windows
-            if os.path.exists(os.path.join(path, "R.exe")):
+            if os.path.isfile(os.path.join(path, "R.exe")):
                 print "Found R at", path
                 return path
             # non windows:
             test = os.path.join(path, "R")
-            if os.path.exists(test) and not os.path.isdir(test):
+            if os.path.isfile(test):
                 return test
         return None
 
@@ -89,12 +98,11 @@ class RExecutor(object):
                                         stdin = fp, stdout = sys.__stdout__,
                                         bufsize=0, shell=True)
             else:
-                proc = subprocess.Popen(['%s --vanilla --silent' % self.rExe],
+                proc = subprocess.Popen([self.rExe, '--vanilla', '--silent'],
                                         stdin = fp, stdout = sys.__stdout__,
-                                        bufsize=0, shell=True)
-            out, err = proc.communicate()
-            if err is not None:
-                print err
+                                        bufsize=0)
+            # no pipes involved, so there is nothing to communicate:
+            proc.wait()
 
         return proc.returncode
 
@@ -104,16 +112,16 @@ class RExecutor(object):
                                     stderr=subprocess.PIPE,
                                     bufsize=0, shell=True)
             out, err = proc.communicate()
-	    answer = err
+            answer = err
         else:
-            proc = subprocess.Popen(['%s --version' % self.rExe],
+            proc = subprocess.Popen([self.rExe, '--version'],
                                     stdout = subprocess.PIPE,
-                                    bufsize=0, shell=True)
+                                    bufsize=0)
             out, err = proc.communicate()
-	    answer = out
+            answer = out
         match = re.search("version\s+(\d+\.\d+\.\d+)", answer)
         if not match:
-	    return None
+            return None
         return match.groups(0)[0]
 
 
@@ -135,7 +143,30 @@ class RExecutor(object):
             with TemporaryDirectoryWithBackup() as dir_:
                 return run(dir_, command)
 
-r_version = RExecutor().get_r_version()
+def _resolveExecutable(exe):
+    if os.path.dirname(exe):
+        return exe if os.path.isfile(exe) else None
+    return RExecutor.parse_path_variable()
+
+def _getRVersion():
+    """ running R takes some time, so the version is cached and only
+        determined again if the R executable changed.
+    """
+    rExe = RExecutor().rExe
+    rExePath = _resolveExecutable(rExe)
+    if rExePath is None:
+        return RExecutor().get_r_version()
+    mtime = os.path.getmtime(rExePath)
+    cached = userConfig.getCachedRVersion()
+    if cached is not None and cached["r_exe"] == rExePath\
+                          and cached["mtime"] == mtime:
+        return cached["version"]
+    r_version = RExecutor().get_r_version()
+    if r_version is not None:
+        userConfig.setCachedRVersion(rExePath, mtime, r_version)
+    return r_version
+
+r_version = _getRVersion()
 userConfig.setRVersion(r_version)
 
 r_libs_folder = userConfig.getRLibsFolder()
@@ -1,13 +1,17 @@
 #encoding: utf-8
+from __future__ import print_function
+
 from RExecutor import RExecutor
 from ..DataStructures import PeakMap, XCMSFeatureParser
 
-import os, sys
+import os, sys, glob, hashlib
+import numpy as np
+from operator import attrgetter
 
 from ..intern_utils import TemporaryDirectoryWithBackup
 from pyopenms import FileHandler
 
-from userConfig import getExchangeSubFolder, getRLibsFolder
+from userConfig import getExchangeSubFolder, getRLibsFolder, getEmzedFolder
 
 exchangeFolderAvailable = getExchangeSubFolder("") is not None
 
@@ -26,11 +30,24 @@ def install_xmcs_if_needed_statements():
     return script
 
 
+# the install check needs only to run once per process:
+_xcms_checked = False
+
+def _install_prelude():
+    if _xcms_checked:
+        return ""
+    return install_xmcs_if_needed_statements()
+
+def _set_xcms_checked():
+    global _xcms_checked
+    _xcms_checked = True
+
+
 def installXcmsIfNeeded():
 
     if not exchangeFolderAvailable:
 # all installled libs will get to local folder
-        print "no xcms install as exchange folder is not available"
+        print("no xcms install as exchange folder is not available")
         return
 
     RExecutor().run_command(install_xmcs_if_needed_statements())
@@ -39,7 +56,7 @@ def installXcmsIfNeeded():
 def lookForXcmsUpgrades():
 
     if not exchangeFolderAvailable:
-        print "no xcms upgrade check as exchange folder is not available"
+        print("no xcms upgrade check as exchange folder is not available")
         return
 
     script = """
@@ -50,15 +67,15 @@ def lookForXcmsUpgrades():
 
     num = RExecutor().run_command(script)
     if not num:
-        print "No update needed"
+        print("No update needed")
     else:
-        print num, "updates found"
+        print(num, "updates found")
 
 
 def doXcmsUpgrade():
 
     if not exchangeFolderAvailable:
-        print "no xcms upgrade as exchange folder is not available"
+        print("no xcms upgrade as exchange folder is not available")
         return
 
     r_libs = getRLibsFolder().replace("\\", "\\\\")
@@ -72,6 +89,11 @@ def doXcmsUpgrade():
     return RExecutor().run_command(script)
 
 
+def _read_doc(path):
+    with open(path) as fp:
+        return fp.read()
+
+
 def _get_temp_peakmap(msLevel, peakMap):
     if msLevel is None:
         msLevels = peakMap.getMsLevels()
@@ -81,10 +103,87 @@ def _get_temp_peakmap(msLevel, peakMap):
         msLevel = msLevels[0]
 
     temp_peakmap =  peakMap.extract(mslevelmin=msLevel, mslevelmax=msLevel)
-    temp_peakmap.spectra.sort(key = lambda s: s.rt)
+    # spectra are usually sorted already, timsort is linear in this case:
+    temp_peakmap.spectra.sort(key=attrgetter("rt"))
     return temp_peakmap
 
 
+def _peakmap_hash(peakMap):
+    h = hashlib.sha1()
+    h.update(repr(peakMap.meta.get("source", "")))
+    for spec in peakMap.spectra:
+        h.update(repr((spec.rt, spec.msLevel, spec.polarity, spec.precursors)))
+        h.update(np.ascontiguousarray(spec.peaks).data)
+    return h.hexdigest()
+
+
+# size limit of the mzData cache in bytes, 0 means: no caching:
+_mzdata_cache_limit = 0
+
+def setMzDataCacheLimit(megabytes):
+    """ writing the input files for xcms is slow, so the feature detectors
+        can keep recently written mzData files in the emzed folder.
+        ``megabytes`` is the maximal size of the cache, ``0`` turns caching
+        off, which is the default.
+    """
+    global _mzdata_cache_limit
+    _mzdata_cache_limit = int(megabytes * 1024 * 1024)
+
+def _store_experiment(peakMap, folder):
+    """ writes peakMap as mzData file to folder, or to the cache folder if
+        caching is turned on. returns path of the mzData file.
+    """
+    if _mzdata_cache_limit > 0:
+        path = _store_experiment_cached(peakMap, _mzdata_cache_limit)
+    else:
+        path = os.path.join(folder, "input.mzData")
+        FileHandler().storeExperiment(path, peakMap.toMSExperiment())
+    # needed for network shares:
+    if sys.platform == "win32":
+        path = path.replace("/","\\")
+    return path
+
+def _store_experiment_cached(peakMap, limit):
+    """ keeps the last written files in a cache folder, keyed by the
+        content of the peakmap. files are removed from the cache, least
+        recently used first, if the cache exceeds limit bytes.
+    """
+    folder = os.path.join(getEmzedFolder(), "mzdata_cache")
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    key = _peakmap_hash(peakMap)
+    path = os.path.join(folder, key + ".mzData")
+    if os.path.exists(path):
+        # mark as recently used:
+        os.utime(path, None)
+        return path
+
+    # write to temp file first, so we never see incomplete files. the
+    # FileHandler determines the format from the file extension:
+    temp_path = os.path.join(folder, "tmp_%s_%d.mzData" % (key, os.getpid()))
+    try:
+        FileHandler().storeExperiment(temp_path, peakMap.toMSExperiment())
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    cached = [p for p in glob.glob(os.path.join(folder, "*.mzData"))
+                if not os.path.basename(p).startswith("tmp_") and p != path]
+    cached.sort(key=os.path.getmtime, reverse=True)
+    total = os.path.getsize(path)
+    for old_path in cached:
+        try:
+            total += os.path.getsize(old_path)
+            if total > limit:
+                os.remove(old_path)
+        except OSError:
+            pass
+    return path
+
+
 class CentwaveFeatureDetector(object):
 
     path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "centwave.txt")
@@ -103,7 +202,7 @@ class CentwaveFeatureDetector(object):
 
     """
 
-    __doc__ += "".join(file(path).readlines())
+    __doc__ += _read_doc(path)
     __doc__ = unicode(__doc__, "utf-8")
 
     standardConfig = dict(   ppm=25,
@@ -134,15 +233,9 @@ class CentwaveFeatureDetector(object):
 
         with TemporaryDirectoryWithBackup() as td:
 
-            temp_input = os.path.join(td, "input.mzData")
+            temp_input = _store_experiment(temp_peakmap, td)
             temp_output = os.path.join(td, "output.csv")
 
-            # needed for network shares:
-            if sys.platform == "win32":
-                temp_input = temp_input.replace("/","\\")
-
-            FileHandler().storeExperiment(temp_input, temp_peakmap.toMSExperiment())
-
             dd = self.config.copy()
             dd["temp_input"] = temp_input
             dd["temp_output"] = temp_output
@@ -150,7 +243,7 @@ class CentwaveFeatureDetector(object):
             dd["verbose_columns"] = str(dd["verbose_columns"]).upper()
 
 
-            script = install_xmcs_if_needed_statements() + """
+            script = _install_prelude() + """
                         library(xcms)
                         xs <- xcmsSet(%(temp_input)r, method="centWave",
                                           ppm=%(ppm)d,
@@ -173,10 +266,11 @@ class CentwaveFeatureDetector(object):
 
             if RExecutor().run_command(script, td) != 123:
                 raise Exception("R operation failed")
+            _set_xcms_checked()
 
             # parse csv and shift rt related values to undo rt modifiaction
             # as described above
-            table = XCMSFeatureParser.parse(file(temp_output).readlines())
+            table = XCMSFeatureParser.parseFile(temp_output)
             table.addConstantColumn("centwave_config", dd, dict, None)
             table.meta["generator"] = "xcms.centwave"
             decorate(table, temp_peakmap)
@@ -200,7 +294,7 @@ class MatchedFilterFeatureDetector(object):
 
     """
 
-    __doc__ += "".join(file(path).readlines())
+    __doc__ += _read_doc(path)
     __doc__ = unicode(__doc__, "utf-8")
 
     standardConfig = dict(   fwhm = 30,
@@ -233,21 +327,15 @@ class MatchedFilterFeatureDetector(object):
 
         with TemporaryDirectoryWithBackup() as td:
 
-            temp_input = os.path.join(td, "input.mzData")
+            temp_input = _store_experiment(peakMap, td)
             temp_output = os.path.join(td, "output.csv")
 
-            # needed for network shares:
-            if sys.platform == "win32":
-                temp_input = temp_input.replace("/","\\")
-
-            FileHandler().storeExperiment(temp_input, peakMap.toMSExperiment())
-
             dd = self.config.copy()
             dd["temp_input"] = temp_input
             dd["temp_output"] = temp_output
             dd["index"] = str(dd["index"]).upper()
 
-            script = install_xmcs_if_needed_statements() + """
+            script = _install_prelude() + """
                         library(xcms)
                         xs <- xcmsSet(%(temp_input)r, method="matchedFilter",
                                        fwhm = %(fwhm)f, sigma = %(sigma)f,
@@ -267,9 +355,10 @@ class MatchedFilterFeatureDetector(object):
 
             if RExecutor().run_command(script, td) != 123:
                 raise Exception("R opreation failed")
+            _set_xcms_checked()
 
             # parse csv and
-            table = XCMSFeatureParser.parse(file(temp_output).readlines())
+            table = XCMSFeatureParser.parseFile(temp_output)
             table.addConstantColumn("matchedfilter_config", dd, dict, None)
             table.meta["generator"] = "xcms.matchedfilter"
             decorate(table, temp_peakmap)
@@ -1,6 +1,8 @@
-from collections import defaultdict as  _defaultdict
+from __future__ import print_function
+
 from scipy.stats import f_oneway as _f_oneway, kruskal as _kruskal
 import numpy as _numpy
+import sys as _sys
 
 from ..DataStructures.Table import Table
 
@@ -8,13 +10,17 @@ from ..DataStructures.Table import Table
 def _getSamples(factorColumn, dependentColumn, minsize=1):
     factors, _, _ = factorColumn._eval(None)
     dependents, _, _ = dependentColumn._eval(None)
-    groups = _defaultdict(list)
-    for factor, depenent in zip(factors, dependents):
-        groups[factor].append(depenent)
-    samples = groups.values()
-    if any(len(s) < minsize for s in samples):
-        print "WARNING: sample has less than %d subjects" % minsize
-    return map(_numpy.array, samples)
+    factors = _numpy.asarray(factors)
+    dependents = _numpy.asarray(dependents)
+    keys, inv = _numpy.unique(factors, return_inverse=True)
+    if len(keys) == 0:
+        return []
+    # group dependents by sorting them according to their factor:
+    order = _numpy.argsort(inv, kind="mergesort")
+    sizes = _numpy.bincount(inv)
+    if (sizes < minsize).any():
+        print("WARNING: sample has less than %d subjects" % minsize)
+    return _numpy.split(dependents[order], _numpy.cumsum(sizes)[:-1])
 
 
 def oneWayAnova(factorColumn, dependentColumn):
@@ -27,13 +33,68 @@ def kruskalWallis(factorColumn, dependentColumn):
     return H, p
 
 
+def _groupByIds(tables, idColumn, valueColumn):
+    """ collects values which are not None from the given tables, grouped
+        by idColumn.  returns ids of all rows and a dict mapping ids to
+        (samples, mean, std)
+    """
+    ids, values = [], []
+    for t in tables:
+        ids.extend(t.getColumn(idColumn).values)
+        values.extend(t.getColumn(valueColumn).values)
+    allIds = set(ids)
+    values = _numpy.array(values, dtype=object)
+    keep = ~_numpy.equal(values, None)
+    values = values[keep].astype(float)
+    if len(values) == 0:
+        return allIds, dict()
+    ids = _numpy.array(ids, dtype=object)[keep]
+    keys, inv = _numpy.unique(ids, return_inverse=True)
+    order = _numpy.argsort(inv, kind="mergesort")
+    sizes = _numpy.bincount(inv)
+    starts = _numpy.cumsum(sizes) - sizes
+    values = values[order]
+    means = _numpy.add.reduceat(values, starts) / sizes
+    deviations = values - _numpy.repeat(means, sizes)
+    stds = _numpy.sqrt(_numpy.add.reduceat(deviations ** 2, starts) / sizes)
+    samples = _numpy.split(values, starts[1:])
+    return allIds, dict(zip(keys, zip(samples, means, stds)))
+
+
+# p value calculators must be module level functions, so that they can be
+# pickled for running them in worker processes:
+
+def _anovaPValue(samples):
+    return _f_oneway(*samples)[1]
+
+
+def _kruskalPValue(samples):
+    return _kruskal(*samples)[1]
+
+
+_MIN_IDS_FOR_POOL = 32
+
+def _calculatePValues(pCalculator, samplePairs, numProcesses):
+    # starting worker processes only pays off for many ids. on windows
+    # workers would import the __main__ module of the calling script, so we
+    # stay serial there:
+    if numProcesses <= 1 or len(samplePairs) < _MIN_IDS_FOR_POOL\
+       or _sys.platform == "win32":
+        return map(pCalculator, samplePairs)
+    import multiprocessing
+    pool = multiprocessing.Pool(numProcesses)
+    try:
+        return pool.map(pCalculator, samplePairs)
+    finally:
+        pool.close()
+        pool.join()
+
+
 def _runStatistcsOnTables(tableSet1, tableSet2, idColumn, valueColumn,
-                          pCalculator):
-    ids = set()
-    for t in tableSet1:
-        ids.update(t.getColumn(idColumn).values)
-    for t in tableSet2:
-        ids.update(t.getColumn(idColumn).values)
+                          pCalculator, numProcesses):
+
+    ids1, groups1 = _groupByIds(tableSet1, idColumn, valueColumn)
+    ids2, groups2 = _groupByIds(tableSet2, idColumn, valueColumn)
 
     result = Table(["id", "n1", "n2",
                     "avg1_" + valueColumn, "std1_" + valueColumn,
@@ -42,26 +103,20 @@ def _runStatistcsOnTables(tableSet1, tableSet2, idColumn, valueColumn,
                    [str, int, int] + 5 * [float],
                    ["%s", "%d", "%d"] + 5 * ["%.2e"])
 
-    for id_ in ids:
-        samples1 = []
-        for t in tableSet1:
-            subt = t.filter(t.getColumn(idColumn) == id_)
-            samples1.extend(subt.getColumn(valueColumn).values)
-        samples2 = []
-        for t in tableSet2:
-            subt = t.filter(t.getColumn(idColumn) == id_)
-            samples2.extend(subt.getColumn(valueColumn).values)
-
-        samples1 = _numpy.array([s for s in samples1 if s is not None])
-        samples2 = _numpy.array([s for s in samples2 if s is not None])
+    missing = (_numpy.zeros((0,)), _numpy.nan, _numpy.nan)
+    ids = sorted(ids1 | ids2)
+    stats1 = [groups1.get(id_, missing) for id_ in ids]
+    stats2 = [groups2.get(id_, missing) for id_ in ids]
+    pValues = _calculatePValues(pCalculator, [(s1[0], s2[0]) for (s1, s2)
+                                                       in zip(stats1, stats2)],
+                                numProcesses)
 
-        p = pCalculator(samples1, samples2)
+    for id_, (samples1, avg1, std1), (samples2, avg2, std2), p\
+            in zip(ids, stats1, stats2, pValues):
 
         new_row = [ id_,
                       len(samples1), len(samples2), ]
-        for v in [ _numpy.mean(samples1), _numpy.std(samples1),
-                   _numpy.mean(samples2), _numpy.std(samples2),
-                   p]:
+        for v in [ avg1, std1, avg2, std2, p]:
             if _numpy.isnan(v):
                 v = None
             else:
@@ -73,7 +128,8 @@ def _runStatistcsOnTables(tableSet1, tableSet2, idColumn, valueColumn,
     return result
 
 
-def oneWayAnovaOnTables(tableSet1, tableSet2, idColumn, valueColumn):
+def oneWayAnovaOnTables(tableSet1, tableSet2, idColumn, valueColumn,
+                        numProcesses=1):
     """
     Compares two sets of tables. Each set is a list of tables, with
     common columns ``idColumn`` and ``valueColumn``. The first one
@@ -102,18 +158,22 @@ def oneWayAnovaOnTables(tableSet1, tableSet2, idColumn, valueColumn):
        tresult = ms.oneWayAnovaOnTables(tables1, tables2, idColumn="compound", valueColumn="foldChange") !noexec
        tresult.print_()
 
+    For many ids you can set ``numProcesses`` greater than one to compute
+    the p values in worker processes. This is ignored on Windows.
+
     """
     result = _runStatistcsOnTables(tableSet1, tableSet2, idColumn, valueColumn,
-             lambda s1, s2: _f_oneway(s1, s2)[1])
+                                   _anovaPValue, numProcesses)
     result.title = "ANOVA ANALYSIS"
     return result
 
 
-def kruskalWallisOnTables(tableSet1, tableSet2, idColumn, valueColumn):
+def kruskalWallisOnTables(tableSet1, tableSet2, idColumn, valueColumn,
+                          numProcesses=1):
     """
        Works as :py:meth:`~ms.oneWayAnovaOnTables` above, but uses non parametric kruskal wallis test.
     """
     result = _runStatistcsOnTables(tableSet1, tableSet2, idColumn, valueColumn,
-             lambda s1, s2: _kruskal(s1, s2)[1])
+                                   _kruskalPValue, numProcesses)
     result.title = "KRUSKAL WALLIS ANALYSIS"
     return result
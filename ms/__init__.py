@@ -18,11 +18,29 @@ from feature_detectors import *
 
 from formula import *
 
-from libms.Explorers       import inspectPeakMap, inspect
 from libms.gui.DialogBuilder import (DialogBuilder,
                                      showWarning,
                                      showInformation)
 
+# the explorers pull in guiqwt and the plotting widgets, so we import them
+# when they are used and not with ms:
+
+def inspectPeakMap(peakmap):
+    """
+    allows the visual inspection of a peakmap
+    """
+    from libms.Explorers import inspectPeakMap
+    return inspectPeakMap(peakmap)
+
+def inspect(what, offerAbortOption=False):
+    """
+    allows the inspection and editing of simple or multiple
+    tables.
+
+    """
+    from libms.Explorers import inspect
+    return inspect(what, offerAbortOption)
+
 def startfile(path):
     import sys, os
     if sys.platform=="win32":
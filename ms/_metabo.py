@@ -7,8 +7,18 @@ from libms.DataStructures import formatSeconds
 
 class _ParamHandler(object):
 
+    # building the params instantiates the pyopenms algorithms, so we do
+    # this only once and hand out copies:
+    _template = None
+
     @staticmethod
     def build_params():
+        if _ParamHandler._template is None:
+            _ParamHandler._template = _ParamHandler._build_template()
+        return _ParamHandler._template.copy("")
+
+    @staticmethod
+    def _build_template():
         mtd_params = pyopenms.MassTraceDetection().getDefaults()
         mtd_params.remove("chrom_peak_snr")
         mtd_params.remove("noise_threshold_int")
@@ -211,6 +221,10 @@ def metaboFeatureFinder(peak_map, config_id=None, ms_level=None, **kw):
 
         info("FOUND %d FEATURES", feature_map.size())
 
+        # counting the hulls first for preallocating rows would need a
+        # second pass over the wrapped pyopenms objects, which is more
+        # expensive than growing the list:
+        append = rows.append
         for i, feature in enumerate(feature_map):
             convex_hulls = feature.getConvexHulls()
             quality = feature.getOverallQuality()
@@ -223,9 +237,8 @@ def metaboFeatureFinder(peak_map, config_id=None, ms_level=None, **kw):
                 bb = convex_hull.getBoundingBox()
                 rtmin, mzmin = bb.minPosition()
                 rtmax, mzmax = bb.maxPosition()
-                row = [i, mz, mzmin, mzmax, rt, rtmin, rtmax, I, quality,
-                       width, z]
-                rows.append(row)
+                append([i, mz, mzmin, mzmax, rt, rtmin, rtmax, I, quality,
+                        width, z])
 
     tab = Table(["feature_id", "mz", "mzmin", "mzmax", "rt", "rtmin", "rtmax",
                     "intensity", "quality", "fwhm", "z"],
@@ -1,24 +1,26 @@
 #encoding: utf-8
 
+from __future__ import print_function
 
 import installConstants as _installConstants
 import numpy as _np
+import re as _re
+
+# carbon atoms in molecular formula, "(?![a-z])" excludes Cl, Ca, ...:
+_C_RE = _re.compile(r"C(\d*)(?![a-z])")
+
+def _carbonCount(mf):
+    return sum(int(n or 1) for n in _C_RE.findall(mf))
 
 
 def _buildHypotheseTable(polarity, univ, fullC13):
-    import re
     import mass
     if fullC13:
         delta = mass.C13 - mass.C12
-        shifts = []
-        for mf in univ.mf.values:
-            atoms = dict(re.findall("([A-Z][a-z]?)(\d*)", mf))
-            nc = atoms.get("C", "0")
-            if nc=="":
-                nc = 0
-            else:
-                nc = int(nc)
-            shifts.append(nc*delta)
+        mfs = univ.mf.values
+        ncs = _np.fromiter((_carbonCount(mf) for mf in mfs), dtype=int,
+                           count=len(mfs))
+        shifts = (ncs * delta).tolist()
         univ.addColumn("c_shift", shifts, type_=float, format="%.6f")
     else:
         univ.addColumn("c_shift", 0.0, type_=float, format="%.6f")
@@ -55,10 +57,32 @@ def _buildHypotheseTable(polarity, univ, fullC13):
 
 
 def _findMzMatches(hypot, table, tol):
-    rtfit = table.rt.inRange(hypot.rtmin, hypot.rtmax)
-    mzfit = table.mz.approxEqual(hypot.mz, tol)
-    matched = table.join(hypot, rtfit & mzfit)
-    print len(matched), "MATCHED UNIV METABOLITES"
+    # same result as table.join(hypot, rtfit & mzfit) with
+    #     rtfit = table.rt.inRange(hypot.rtmin, hypot.rtmax)
+    #     mzfit = table.mz.approxEqual(hypot.mz, tol)
+    # but we look up mz candidates in the sorted hypot mz values instead of
+    # checking all pairs of rows:
+    hmz = _np.array([_np.nan if v is None else v for v in hypot.mz.values],
+                    dtype=float)
+    hrtmin = hypot.rtmin.values
+    hrtmax = hypot.rtmax.values
+    order = _np.argsort(hmz, kind="mergesort")
+    sortedMz = hmz[order]
+
+    rows = []
+    for row, mz, rt in zip(table.rows, table.mz.values, table.rt.values):
+        if mz is None or rt is None:
+            continue
+        lo = _np.searchsorted(sortedMz, mz - tol, side="left")
+        hi = _np.searchsorted(sortedMz, mz + tol, side="right")
+        # keep order of hypot rows as join does:
+        for j in _np.sort(order[lo:hi]):
+            rtmin, rtmax = hrtmin[j], hrtmax[j]
+            if rtmin is not None and rtmax is not None and rtmin <= rt <= rtmax:
+                rows.append(row[:] + hypot.rows[j][:])
+    matched = table._buildJoinTable(hypot)
+    matched.rows = rows
+    print(len(matched), "MATCHED UNIV METABOLITES")
     matched = matched.extractColumns("mz", "mz__0", "rt", "rtmin__0", "rtmax__0",
                                     "name__0", "mode__0", "url__0")
     matched.renameColumns(mz__0="mz_exact", rtmin__0="rtmin",
@@ -74,15 +98,19 @@ def _fitLp(A, b, p, N=10):
         iterative weighting maxtrix is
 
                  w_ii = resid_i^[(p-2)/2
+
+        the weighting matrix is diagonal, so we only keep its diagonal
+        as vector w and scale the rows of A and b.
     """
-    W = _np.eye(len(b))
+    b = _np.asarray(b).squeeze()
+    w = _np.ones(len(b))
     lastParam = None
     for i in range(N): # 2 iterations seem to be enough
-        WA = _np.dot(W, A)
-        Wb = _np.dot(W, b).squeeze()
-        param, _, _,_ = _np.linalg.lstsq(WA, Wb)
+        WA = A * w[:, None]
+        Wb = b * w
+        param, _, _, _ = _np.linalg.lstsq(WA, Wb)
         resid = _np.abs(_np.dot(A, param) - b)
-        W = _np.diag((1e-8+resid)** (p-2.0)/2.0)
+        w = (1e-8+resid)** (p-2.0)/2.0
         if lastParam is None:
             lastParam = param
         else:
@@ -91,47 +119,57 @@ def _fitLp(A, b, p, N=10):
             if delta < 1e-3:
                 break
     else:
-        print "WARNING: IRLS did not converge within %d iterations" % N
+        print("WARNING: IRLS did not converge within %d iterations" % N)
 
     return param
 
-def _removeValue(vec, idx):
-    return _np.hstack((vec[:idx], vec[idx+1:]))
-
 def _findParametersAutomatically(tobe, real, minR2, minPoints):
-    while len(real)>=minPoints:
-        transform, r2, imax, _, _ = _calculateParameters(real, tobe)
-        print "NUMPOINTS=%3d  goodness=%.3f" % (len(real), r2)
+    # marks matches which are not removed yet:
+    keep = _np.ones(len(real), dtype=bool)
+    numPoints = len(real)
+    while numPoints>=minPoints:
+        realUsed, tobeUsed = real[keep], tobe[keep]
+        transform, r2, imax, _, _ = _calculateParameters(realUsed, tobeUsed)
+        print("NUMPOINTS=%3d  goodness=%.3f" % (numPoints, r2))
         if r2>=minR2:
             break
         # remove match which fits worst:
-        real = _removeValue(real, imax)
-        tobe = _removeValue(tobe, imax)
+        keep[_np.flatnonzero(keep)[imax]] = False
+        numPoints -= 1
     else:
         raise Exception("could only reach R^2=%f" % r2)
 
-    return transform, (real, tobe)
+    return transform, (realUsed, tobeUsed)
 
 def _calculateParameters(real, tobe, p=1.01):
     # robust fit real vs (tobe-real) with p < 2
-    A = _np.ones((len(real),2))
-    A[:,0] = real
+    A = _np.column_stack((real, _np.ones(len(real))))
     shifts = tobe - real
     (a,b) = _fitLp(A, shifts, p)
     fittedShift = a*real + b
-    resid = _np.abs(fittedShift - shifts.flatten())
-    # replacement for perason r in case of m-estimators:
-    nom= _np.linalg.norm(fittedShift-shifts, ord=p)
+    resid = _np.abs(fittedShift - shifts)
+    # replacement for perason r in case of m-estimators, nom is the p-norm
+    # of the residuals, we reuse resid instead of computing them again:
+    nom = _np.sum(resid ** p) ** (1.0/p)
     denom = _np.linalg.norm(shifts-_np.median(shifts), ord=p)
     r = 1.0-nom/denom
     imax = _np.argmax(resid)
-    valmax = resid[imax]
     fitted = fittedShift + real
     a = float(a)
     b = float(b)
     transform = lambda x: a*x + b +x
     return transform, r, imax, fitted, resid
 
+def _stems(x, y, color="b"):
+    """ vertical lines from (x, 0) to (x, y) as one single collection """
+    from matplotlib.collections import LineCollection
+    x = _np.asarray(x, dtype=float)
+    y = _np.asarray(y, dtype=float)
+    segments = _np.zeros((len(x), 2, 2))
+    segments[:, :, 0] = x[:, None]
+    segments[:, 1, 1] = y
+    return LineCollection(segments, colors=color)
+
 def _plotAndSaveMatch(tobe, real, used, transform, path):
     import matplotlib
     matplotlib.use("Qt4Agg")
@@ -144,8 +182,7 @@ def _plotAndSaveMatch(tobe, real, used, transform, path):
 
     pylab.subplot(2,1,2)
     pylab.plot([_np.min(real), _np.max(real)],[0,0])
-    for (rr,rs) in zip(real, tobe-fitted):
-        pylab.plot([rr,rr],[0,rs], "b")
+    pylab.gca().add_collection(_stems(real, tobe-fitted))
     pylab.plot(real, tobe-fitted, "ro")
 
     pylab.subplot(2,1,1)
@@ -169,10 +206,12 @@ class _MatchSelector(QDialog):
         QDialog.__init__(self)
         self.setWindowFlags(Qt.Window)
         self.setWindowTitle("Matched Feature Selector")
-        self.real = _np.array(real)
-        self.tobe = _np.array(tobe)
-        self.savedReal = self.real.copy()
-        self.savedTobe = self.tobe.copy()
+        self.savedReal = _np.array(real)
+        self.savedTobe = _np.array(tobe)
+        # marks points which are not removed by the user:
+        self.keep = _np.ones(len(self.savedReal), dtype=bool)
+        self.real = self.savedReal
+        self.tobe = self.savedTobe
         self.exitCode = 1 # abort is default for closing
         self.setupMainFrame()
         self.indexOfActivePoint = -1
@@ -186,8 +225,9 @@ class _MatchSelector(QDialog):
             return
 
         pointIndex = event.ind[0]
-        self.real = _removeValue(self.real, pointIndex)
-        self.tobe = _removeValue(self.tobe, pointIndex)
+        self.keep[_np.flatnonzero(self.keep)[pointIndex]] = False
+        self.real = self.savedReal[self.keep]
+        self.tobe = self.savedTobe[self.keep]
         self.indexOfActivePoint = -1
         self.update()
         self.onDraw()
@@ -198,10 +238,20 @@ class _MatchSelector(QDialog):
         self.fitted = fitted
         self.r2 = r2
         self.transform = transform
+        self._buildSearchTree()
+
+    def _buildSearchTree(self):
+        from scipy.spatial import cKDTree
+        pts = _np.column_stack((self.real, self.tobe - self.real))
+        # we have to scale distances, due to different ranges on x and y
+        # axis, 1e-6 avoids zero division:
+        self._range = _np.ptp(pts, axis=0) + 1e-6
+        self._tree = cKDTree(pts / self._range)
 
     def reset(self):
-        self.real = self.savedReal.copy()
-        self.tobe = self.savedTobe.copy()
+        self.keep[:] = True
+        self.real = self.savedReal
+        self.tobe = self.savedTobe
         self.update()
         self.onDraw()
 
@@ -227,8 +277,7 @@ class _MatchSelector(QDialog):
         self.upper.plot(real, fitted - real)
 
         self.lower.plot([_np.min(real), _np.max(real)],[0,0])
-        for (rr,rs) in zip(real, tobe-fitted):
-            self.lower.plot([rr,rr],[0, abs(rs)], "b")
+        self.lower.add_collection(_stems(real, _np.abs(tobe-fitted)))
         self.lower.plot(real, _np.abs(tobe-fitted), "o")
         self.canvas.draw()
 
@@ -244,23 +293,12 @@ class _MatchSelector(QDialog):
         if not evt.inaxes is self.upper:
             return
 
-        pts = _np.array([ (x, y-x) for x,y in zip(self.real, self.tobe)])
-        maxvals = _np.max(pts, axis=0) # max along vertical axis
-        minvals = _np.min(pts, axis=0) # min alogn vertical axis
-        range_ = maxvals - minvals    # is now of shape (1,2)
-
         # mouse coordinates in coordinates in respect of plotted data:
         x = evt.xdata
         y = evt.ydata
-        # we have to scale distances, due to different ranges on x and y
-        # axis:
-        range_ += 1-6 # avoids zero division in next step
-        distmatrix = (pts-_np.array((x,y)))/range_
 
         # find next point in plot:
-        distances = _np.sqrt(_np.sum(distmatrix**2, axis=1))
-        i = _np.argmin(distances)
-        bestdist= distances[i]
+        bestdist, i = self._tree.query(_np.array((x, y)) / self._range)
 
         def deactivatePoint(x,y):
             self.upper.plot(x, y-x, "o", color=self.inactiveColor)
@@ -335,19 +373,40 @@ def _findParametersManually(tobe, real):
         return None, None
     return m.transform, (m.real, m.tobe)
 
-def _applyTransform(table, transform):
+def _transformColumn(table, name, transform):
+    values = table.getColumn(name).values
+    if None in values:
+        table.replaceColumn(name, table.getColumn(name).apply(transform))
+    else:
+        # transform is affine, so we apply it to the full column at once:
+        values = transform(_np.array(values, dtype=float))
+        table.replaceColumn(name, values.tolist())
+
+def _transformPeakMap(peakmap, transform):
+    """ returns transformed copy of peakmap, only the peaks are copied """
     import copy
-    # as we modify peakmaps below we need a real deepcopy here:
-    table = copy.deepcopy(table)
-    table.replaceColumn("mz", table.mz.apply(transform))
-    table.replaceColumn("mzmin", table.mzmin.apply(transform))
-    table.replaceColumn("mzmax", table.mzmax.apply(transform))
+    spectra = []
+    for spec in peakmap.spectra:
+        spec = copy.copy(spec)
+        peaks = spec.peaks.copy()
+        peaks[:,0] = transform(peaks[:,0])
+        spec.peaks = peaks
+        spectra.append(spec)
+    peakmap = copy.copy(peakmap)
+    peakmap.spectra = spectra
+    peakmap.meta = peakmap.meta.copy()
+    return peakmap
+
+def _applyTransform(table, transform):
+    # no deepcopy needed here: the columns and peaks we modify below are
+    # replaced by new objects, so the original table stays untouched:
+    table = table.copy()
+    for name in ("mz", "mzmin", "mzmax"):
+        _transformColumn(table, name, transform)
 
     peakmaps = set(table.peakmap.values)
     assert len(peakmaps) == 1, "can only align features from one single peakmap"
-    peakmap = peakmaps.pop()
-    for spec in peakmap.spectra:
-        spec.peaks[:,0] = transform(spec.peaks[:,0])
+    peakmap = _transformPeakMap(peakmaps.pop(), transform)
     table.replaceColumn("peakmap", peakmap)
     table.meta["mz_aligned"]=True
     return table
@@ -33,7 +33,6 @@ def rtAlign(tables, refTable = None, destination = None, nPeaks=-1,
 
     import os.path
     import pyopenms
-    import copy
     from  libms.DataStructures.Table import toOpenMSFeatureMap, Table
     import custom_dialogs
 
@@ -41,10 +40,7 @@ def rtAlign(tables, refTable = None, destination = None, nPeaks=-1,
     assert destination is None or isinstance(destination, basestring)
 
     for table in tables:
-        # collect all maps
-        maps = set(table.peakmap.values)
-        assert len(maps) == 1, "can only align features from one single peakmap"
-        map = maps.pop()
+        map = _uniquePeakMap(table)
         assert map != None, "None value for peakmaps not allowed"
         if forceAlign:
             map.meta["rt_aligned"]=False
@@ -55,8 +51,8 @@ def rtAlign(tables, refTable = None, destination = None, nPeaks=-1,
                           "parameter of this function\nto align all tables"
                 raise Exception(message)
         assert isinstance(table, Table), "non table object in tables"
-        table.requireColumn("mz"), "need mz column for alignment"
-        table.requireColumn("rt"), "need rt column for alignment"
+        if not table.hasColumns("mz", "rt"):
+            raise Exception("need mz and rt column for alignment")
 
     if destination is None:
         destination = custom_dialogs.askForDirectory()
@@ -65,12 +61,10 @@ def rtAlign(tables, refTable = None, destination = None, nPeaks=-1,
             return
 
     if refTable is not None:
-        maps = set(refTable.peakmap.values)
-        assert len(maps) == 1, "can only align features from one single peakmap"
-        map = maps.pop()
+        map = _uniquePeakMap(refTable)
         assert map != None, "None value for peakmaps not allowed"
-        refTable.requireColumn("mz"), "need mz column in reftable"
-        refTable.requireColumn("rt"), "need rt column in reftable"
+        if not refTable.hasColumns("mz", "rt"):
+            raise Exception("need mz and rt column in reftable")
 
     assert os.path.isdir(os.path.abspath(destination)), "target is no directory"
 
@@ -100,11 +94,13 @@ def rtAlign(tables, refTable = None, destination = None, nPeaks=-1,
             refMap = fms[tables.index(refTable)][0]
         else:
             refMap = toOpenMSFeatureMap(refTable)
+    # the reference is the same for all tables, so we set it only once:
+    algo.setReference(refMap)
     results = []
     for fm, table in fms:
         # we do not modify existing table inkl. peakmaps: (rt-values
         # might change below in _transformTable) !
-        table = copy.deepcopy(table)
+        table = _copyTable(table)
         if fm is refMap:
             results.append(table)
             continue
@@ -123,16 +119,35 @@ def rtAlign(tables, refTable = None, destination = None, nPeaks=-1,
         t.meta["rt_aligned"] = True
     return results
 
+def _uniquePeakMap(table):
+    # peakmaps have no __eq__, so this check is the same as building a set
+    # of all values:
+    values = table.peakmap.values
+    first = values[0] if values else None
+    assert values and all(v is first for v in values),\
+           "can only align features from one single peakmap"
+    return first
+
+def _copyTable(table):
+    """ copies table and its peakmap. the peaks of the spectra are shared
+        with the original peakmap, as rtAlign only modifies rt values.
+    """
+    import copy
+    table = table.copy()
+    peakmap = copy.copy(table.peakmap.values[0])
+    peakmap.spectra = [copy.copy(spec) for spec in peakmap.spectra]
+    peakmap.meta = peakmap.meta.copy()
+    table.replaceColumn("peakmap", peakmap, table.getColType("peakmap"),
+                        table.getColFormat("peakmap"))
+    return table
+
 def _computeTransformation(algo, refMap, fm, numBreakpoints):
     # be careful: alignFeatureMaps modifies second arg,
     # so you MUST NOT put the arg as [] into this
     # function ! in this case you have no access to the calculated
     # transformations.
     import pyopenms
-    #ts = []
-    # index is 1-based, so 1 refers to refMap when calling
-    # alignFeatureMaps below:
-    algo.setReference(refMap)
+    # the caller has to set refMap as reference of algo !
     trafo = pyopenms.TransformationDescription()
     if (refMap == fm):
         trafo.fitModel("identity")
@@ -158,13 +173,14 @@ def _plot_and_save(transformation, filename, destination):
     if len(dtp) == 0:
         raise Exception("no matches found.")
 
-    x,y = zip(*dtp)
-    x = np.array(x)
-    y = np.array(y)
+    xy = np.array(dtp, dtype=np.float64)
+    x = xy[:, 0].copy()
+    y = xy[:, 1]
     pylab.clf()
     pylab.plot(x, y-x, ".")
     x.sort()
-    yn = [ transformation.apply(xi) for xi in x]
+    apply = transformation.apply
+    yn = np.fromiter((apply(xi) for xi in x), dtype=np.float64, count=len(x))
     pylab.plot(x, yn-x)
     filename = os.path.splitext(filename)[0]+"_aligned.png"
     target_path = os.path.join(destination, filename)
@@ -175,17 +191,30 @@ def _plot_and_save(transformation, filename, destination):
 
 def _transformTable(table, transformation):
 
-    transfun = lambda x: transformation.apply(x)
-
-    table.replaceColumn("rt", table.rt.apply(transfun))
-    table.replaceColumn("rtmin", table.rtmin.apply(transfun))
-    table.replaceColumn("rtmax", table.rtmax.apply(transfun))
+    # transformation.apply only accepts single values, so we avoid the
+    # detour via expressions and call the bound method directly.
+    # rtmin and rtmax values of features are usually scan times, so many
+    # values repeat and we cache the results:
+    cache = dict()
+    trafo = transformation.apply
+
+    def apply(rt):
+        try:
+            return cache[rt]
+        except KeyError:
+            cache[rt] = result = trafo(rt)
+            return result
+
+    for name in ("rt", "rtmin", "rtmax"):
+        values = table.getColumn(name).values
+        table.replaceColumn(name, [apply(v) if v is not None else None
+                                   for v in values])
 
     # we know that there is only one peakmap in the table
     peakmap = table.peakmap.values[0]
     peakmap.meta["rt_aligned"] = True
     table.meta["rt_aligned"] = True
     for spec in peakmap.spectra:
-        spec.rt = transformation.apply(spec.rt)
+        spec.rt = apply(spec.rt)
     table.replaceColumn("peakmap", peakmap)
 
@@ -2,6 +2,7 @@
 
 from libms.RConnect import CentwaveFeatureDetector as _Centwave
 from libms.RConnect import MatchedFilterFeatureDetector as _MatchedFilters
+from libms.RConnect import setMzDataCacheLimit
 
 from _metabo import metaboFeatureFinder
 
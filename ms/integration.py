@@ -29,40 +29,47 @@ def integrate(ftable, integratorid="std", msLevel=None, showProgress = True):
 
     resultTable = ftable.copy()
 
+    # row indices where the progress percentage changes, so we do not have
+    # to compute it for every row:
+    checkpoints = dict()
+    numSteps = len(ftable) * len(supportedPostfixes)
+    for cent in range(21):
+        i = max(-(-cent * numSteps // 20) - 1, 0)
+        if i < len(ftable):
+            checkpoints[i] = cent
+
     lastcent = -1
+    lastPeakMap = None
+    integratePeak = integrator.integrate
     for postfix in supportedPostfixes:
-        areas = []
-        rmses = []
-        paramss =[]
-        for i, row in enumerate(ftable.rows):
-            if showProgress:
-                # integer div here !
-                cent = ((i+1)*20)/len(ftable)/len(supportedPostfixes)
+        # missing values are None in tables, so we use preallocated lists
+        # here and not numpy arrays:
+        areas = [None] * len(ftable)
+        rmses = [None] * len(ftable)
+        paramss = [None] * len(ftable)
+        # fetch needed columns once instead of looking up values per row:
+        columns = [ftable.getColumn(name+postfix).values
+                   for name in ("rtmin", "rtmax", "mzmin", "mzmax", "peakmap")]
+        for i, (rtmin, rtmax, mzmin, mzmax, peakmap) in enumerate(zip(*columns)):
+            if showProgress and i in checkpoints:
+                cent = checkpoints[i]
                 if cent != lastcent:
                     print cent*5,
                     sys.stdout.flush()
                     lastcent = cent
-            rtmin = ftable.getValue(row, "rtmin"+postfix)
-            rtmax = ftable.getValue(row, "rtmax"+postfix)
-            mzmin = ftable.getValue(row, "mzmin"+postfix)
-            mzmax = ftable.getValue(row, "mzmax"+postfix)
-            peakmap = ftable.getValue(row, "peakmap"+postfix)
             if rtmin is None or rtmax is None or mzmin is None or mzmax is None\
                      or peakmap is None:
-                area, rmse, params = (None, )* 3
-            else:
-                # this is a hack ! ms level n handling should first be
-                # improved and gerenalized in MSTypes.py
+                continue
+            # this is a hack ! ms level n handling should first be
+            # improved and gerenalized in MSTypes.py
+            if peakmap is not lastPeakMap:
                 integrator.setPeakMap(peakmap)
-                result = integrator.integrate(mzmin, mzmax, rtmin, rtmax,
-                                             msLevel)
-                # take existing values which are not integration realated:
-                area, rmse, params = result["area"], result["rmse"],\
-                                     result["params"]
-
-            areas.append(area)
-            rmses.append(rmse)
-            paramss.append(params)
+                lastPeakMap = peakmap
+            result = integratePeak(mzmin, mzmax, rtmin, rtmax, msLevel)
+            # take existing values which are not integration realated:
+            areas[i] = result["area"]
+            rmses[i] = result["rmse"]
+            paramss[i] = result["params"]
 
         resultTable._updateColumnWithoutNameCheck("method"+postfix,
                 integratorid, str, "%s", insertBefore="peakmap"+postfix)
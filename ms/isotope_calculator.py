@@ -68,11 +68,11 @@ def isotopeDistributionTable(formula, R=None, fullC13=False, minp=0.01, **kw):
     """
     from libms.DataStructures.Table import Table
     gen = _setupIsotopeDistributionGenerator(formula, R, fullC13, minp, **kw)
-    t = Table(["mf", "mass", "abundance"], [str, float, float],
-                                           ["%s", "%.6f", "%.3f"], [])
-    for mass, abundance in gen.getCentroids():
-        t.addRow([formula, mass, abundance], False)
-    t.resetInternals()
-    return t
+    # the table constructor does no type conversion as addRow does, so we
+    # convert numpy floats here:
+    rows = [[formula, float(mass), float(abundance)] for (mass, abundance)
+                                                     in gen.getCentroids()]
+    return Table(["mf", "mass", "abundance"], [str, float, float],
+                                          ["%s", "%.6f", "%.3f"], rows)
 
 
@@ -9,6 +9,7 @@ toTable.__doc__ = Table.toTable.__doc__
 
 
 def _topo_sort_with_in_order(orderings):
+    import heapq
 
     for ordering in orderings:
         assert isinstance(ordering, (list, tuple, str, unicode))
@@ -16,50 +17,56 @@ def _topo_sort_with_in_order(orderings):
     # give nodes some rank according to first appearance
     # in orderings:
     rank = dict()
+    setdefault = rank.setdefault
     for i, n in enumerate(orderings):
         for ni in n:
-            if ni not in rank: # first occurance ?
-                rank[ni]=i
+            setdefault(ni, i) # keeps first occurance
 
     # build graph. each node has follower list, sinks have
-    # empty follower list
+    # empty follower list. we keep the predecessors of each node too, so
+    # removing a sink only touches its neighbours:
     nodes = set(ni for n in orderings for ni in n)
     graph = dict()
+    predecessors = dict()
     for node in nodes:
         graph[node] = set()
+        predecessors[node] = set()
 
     for ordering in orderings:
         for n0, n1 in zip(ordering[:-1], ordering[1:]):
             graph[n0].add(n1)
+            predecessors[n1].add(n0)
 
-    # topological sort is easy: remove sinks until graph is empty
+    # topological sort is easy: remove sinks until graph is empty.
+    # we collect the sinks in reversed order, as appending is cheaper
+    # than inserting at the front:
     topo_ordering = []
 
-    sinks_to_process = set(n for n in graph if not graph[n])
+    # here comes special modification: we always remove the sink which
+    # appears last in input args of this function, so we keep the sinks
+    # in a heap ordered by descending rank. sinks never share the same
+    # rank, as nodes of equal rank are connected by the ordering they
+    # first appear in:
+    sinks_to_process = [(-rank[n], n) for n in graph if not graph[n]]
+    heapq.heapify(sinks_to_process)
     while sinks_to_process:
-        # here comes special modification: remove sink which appears
-        # last in input args of this function:
-        current_sink = max(sinks_to_process, key = lambda n: rank[n])
-
         # remove current sink from todo list
-        sinks_to_process.remove(current_sink)
+        __, current_sink = heapq.heappop(sinks_to_process)
         # update topo_ordering
-        topo_ordering.insert(0, current_sink)
+        topo_ordering.append(current_sink)
 
-        # remove current sink from graph
+        # remove current sink from graph. as we removed sink, maybe new
+        # sinks appeared, so update sinks_to_process:
         del graph[current_sink]
-        for followers in graph.values():
-            if current_sink in followers:
-                followers.remove(current_sink)
-
-        # as we removed sink, maybe new sinks appeared, so
-        # update sinks_to_process:
-        for n in graph:
-            if not graph[n]:
-                sinks_to_process.add(n)
+        for n in predecessors[current_sink]:
+            followers = graph[n]
+            followers.remove(current_sink)
+            if not followers:
+                heapq.heappush(sinks_to_process, (-rank[n], n))
 
     if len(topo_ordering) != len(nodes):
         return None # failed
+    topo_ordering.reverse()
     return topo_ordering
 
 
@@ -73,10 +80,11 @@ def _build_starttable(tables, force_merge):
         raise Exception("could not combine all column names to a "\
                 "consistent order. you have to provide a reference table")
 
+    # we check all types before we check formats, so type conflicts are
+    # reported first:
     types = dict()
     for table in tables:
-        for name in table._colNames:
-            type_ = table.getType(name)
+        for name, type_ in zip(table._colNames, table._colTypes):
             if types.get(name, type_) != type_:
                 if not force_merge:
                     raise Exception("type conflictfor column %s" % name)
@@ -85,8 +93,7 @@ def _build_starttable(tables, force_merge):
 
     formats = dict()
     for table in tables:
-        for name in table._colNames:
-            format_ = table.getFormat(name)
+        for name, format_ in zip(table._colNames, table._colFormats):
             if formats.get(name, format_) != format_:
                 if not force_merge:
                     raise Exception("format conflict for column %s" % name)
@@ -100,6 +107,22 @@ def _build_starttable(tables, force_merge):
     prototype = Table._create(colum_names, final_types, final_formats)
     return prototype, colum_names
 
+def _extendColumns(table, colnames, prototype):
+    """ returns new table with columns colnames. columns missing in table
+        are filled with None values, their types and formats are taken
+        from prototype.
+    """
+    # colIndizes is a dict, so we avoid the linear search of hasColumn:
+    indices = [table.colIndizes.get(name) for name in colnames]
+    types = [table._colTypes[i] if i is not None else prototype.getType(name)
+             for (i, name) in zip(indices, colnames)]
+    formats = [table._colFormats[i] if i is not None
+               else prototype.getFormat(name)
+               for (i, name) in zip(indices, colnames)]
+    rows = [[row[i] if i is not None else None for i in indices]
+            for row in table.rows]
+    return Table(colnames, types, formats, rows, table.title, table.meta.copy())
+
 def mergeTables(tables, reference_table=None, force_merge=False):
     """ merges tables. Eg:
 
@@ -127,17 +150,10 @@ def mergeTables(tables, reference_table=None, force_merge=False):
     else:
         start_with, final_colnames  = _build_starttable(tables, force_merge)
 
-    extended_tables = []
-    for table in tables:
-        missing_names = [c for c in final_colnames if c not in table._colNames]
-        if missing_names:
-            table = table.copy()
-            for name in missing_names:
-                type_ = start_with.getType(name)
-                format_ = start_with.getFormat(name)
-                table.addColumn(name, None, type_, format_)
-        table = table.extractColumns(*final_colnames)
-        extended_tables.append(table)
+    # the rows of the extended tables are the rows of the result, so we
+    # do not hold extra copies here:
+    extended_tables = [_extendColumns(table, final_colnames, start_with)
+                       for table in tables]
 
     result = extended_tables[0]
     result.append(extended_tables[1:])
@@ -168,34 +184,36 @@ def openInBrowser(urlPath):
 
 
 def _recalculateMzPeakFor(postfix):
-    def calculator(table, row, name, postfix=postfix):
-
-        mzmin = table.get(row, "mzmin"+postfix)
-        mzmax = table.get(row, "mzmax"+postfix)
-        rtmin = table.get(row, "rtmin"+postfix)
-        rtmax = table.get(row, "rtmax"+postfix)
-        pm    = table.get(row, "peakmap"+postfix)
+    # build column names once and not for every row:
+    mzmin_c = "mzmin" + postfix
+    mzmax_c = "mzmax" + postfix
+    rtmin_c = "rtmin" + postfix
+    rtmax_c = "rtmax" + postfix
+    pm_c = "peakmap" + postfix
+
+    def calculator(table, row, name):
+        get = table.getValue
+        mzmin = get(row, mzmin_c)
+        mzmax = get(row, mzmax_c)
+        rtmin = get(row, rtmin_c)
+        rtmax = get(row, rtmax_c)
+        pm    = get(row, pm_c)
         mz = pm.representingMzPeak(mzmin, mzmax, rtmin, rtmax)
         return mz if mz is not None else (mzmin+mzmax)/2.0
     return calculator
 
-def _hasRangeColumns(table, postfix):
-    return all([table.hasColumn(n + postfix) for n in ["rtmin", "rtmax",
-                                                 "mzmin", "mzmax", "peakmap"]])
-
 def recalculateMzPeaks(table):
-    #TODO: tests !
     """Adds mz value for peaks not detected with centwaves algorithm based on
        rt and mz window: needed are columns mzmin, mzmax, rtmin, rtmax and
-       peakmap mz, postfixes are automaticaly taken into account"""
-    postfixes = [ "" ] + [ "__%d" % i for i in range(len(table._colNames))]
+       peakmap mz, postfixes are automaticaly taken into account.
+       Only the postfixes ``""`` and ``"__0"``, ``"__1"``, ... as created by
+       joins are considered, so eg columns ``mzmin_x``, ... are ignored."""
+    import re
+    postfixes = [pf for pf in table.supportedPostfixes(["rtmin", "rtmax",
+                                                "mzmin", "mzmax", "peakmap"])
+                    if re.match(r"(__\d+)?$", pf)]
     for postfix in postfixes:
-        if _hasRangeColumns(table, postfix):
-            mz_col = "mz" + postfix
-            if table.hasColumn(mz_col):
-                table.replaceColumn(mz_col, _recalculateMzPeakFor(postfix),
-                                    format="%.5f", type_=float)
-            else:
-                table.addColumn(mz_col, _recalculateMzPeakFor(postfix),
-                                format="%.5f", type_=float)
+        table._updateColumnWithoutNameCheck("mz" + postfix,
+                                            _recalculateMzPeakFor(postfix),
+                                            format_="%.5f", type_=float)
 
@@ -4,6 +4,7 @@
 import sys
 import os
 import os.path as osp
+import re
 import pdb
 import bdb
 import __builtin__
@@ -435,14 +436,16 @@ class UserModuleDeleter(object):
         if pathlist is None:
             pathlist = []
         self.pathlist = pathlist
-        self.previous_modules = sys.modules.keys()
+        # run() checks every module in sys.modules, so we build the lookup
+        # structures only once:
+        self.previous_modules = frozenset(sys.modules)
+        self._pathprefixes = tuple([sys.prefix]+self.pathlist)
+        self._nameset = frozenset(self.namelist)
 
     def is_module_blacklisted(self, modname, modpath):
-        for path in [sys.prefix]+self.pathlist:
-            if modpath.startswith(path):
-                return True
-        else:
-            return set(modname.split('.')) & set(self.namelist)
+        if modpath.startswith(self._pathprefixes):
+            return True
+        return not self._nameset.isdisjoint(modname.split('.'))
 
     def run(self, verbose=False):
         """
@@ -453,8 +456,10 @@ class UserModuleDeleter(object):
         Do not del C modules
         """
         log = []
-        for modname, module in sys.modules.items():
+        # we copy the names as we delete from sys.modules below:
+        for modname in list(sys.modules):
             if modname not in self.previous_modules:
+                module = sys.modules[modname]
                 modpath = getattr(module, '__file__', None)
                 if modpath is None:
                     # *module* is a C module that is statically linked into the
@@ -537,6 +542,9 @@ def debugfile(filename, args=None, wdir=None):
 __builtin__.debugfile = debugfile
 
 
+_CLEAR_RE = re.compile(r"^clear ([a-zA-Z0-9_, ]+)")
+_CD_RE = re.compile(r"^cd \"?\'?([a-zA-Z0-9_\ \:\\\/\.]+)")
+
 def evalsc(command):
     """Evaluate special commands
     (analog to IPython's magic commands but far less powerful/complete)"""
@@ -554,18 +562,14 @@ def evalsc(command):
     else:
         # General command
         namespace = _get_globals()
-        import re
-        clear_match = re.match(r"^clear ([a-zA-Z0-9_, ]+)", command)
-        cd_match = re.match(r"^cd \"?\'?([a-zA-Z0-9_\ \:\\\/\.]+)", command)
+        clear_match = _CLEAR_RE.match(command)
+        cd_match = _CD_RE.match(command)
         if cd_match:
             os.chdir(eval('r"%s"' % cd_match.groups()[0].strip()))
         elif clear_match:
             varnames = clear_match.groups()[0].replace(' ', '').split(',')
             for varname in varnames:
-                try:
-                    namespace.pop(varname)
-                except KeyError:
-                    pass
+                namespace.pop(varname, None)
         elif command in ('cd', 'pwd'):
             print os.getcwdu()
         elif command == 'ls':
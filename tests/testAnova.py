@@ -93,3 +93,61 @@ def testOnTables():
     assert tresult.title=="KRUSKAL WALLIS ANALYSIS"
 
 
+
+def testOnTablesWithMissingValues():
+    # "C" only appears in the first set, "D" only in the second, "E" has
+    # only missing values and one row has no compound at all:
+    t1 = ms.toTable("compound", ["B", "A", "C", None, "E"])
+    t1.addColumn("area", [2.0, 1.0, 3.0, 5.0, None])
+    t2 = t1.copy()
+    t2.replaceColumn("area", [2.1, None, 3.3, 5.5, None])
+
+    t3 = ms.toTable("compound", ["D", "A", "B", None])
+    t3.addColumn("area", [4.0, 1.5, None, 6.0])
+    t4 = t3.copy()
+    t4.replaceColumn("area", [4.4, 1.6, 2.5, 6.6])
+
+    tresult = ms.oneWayAnovaOnTables([t1, t2], [t3, t4], idColumn="compound",
+                                                         valueColumn="area")
+
+    assert tresult.id.values == [None, "A", "B", "C", "D", "E"]
+    assert tresult.n1.values == [2, 1, 2, 2, 0, 0]
+    assert tresult.n2.values == [2, 2, 1, 0, 2, 0]
+
+    assert abs(tresult.avg1_area.values[0] - 5.25) < 1e-12
+    assert abs(tresult.avg2_area.values[1] - 1.55) < 1e-12
+    assert abs(tresult.std1_area.values[2] - 0.05) < 1e-12
+    assert tresult.std2_area.values[2] == 0.0
+
+    assert tresult.avg2_area.values[3] is None
+    assert tresult.std2_area.values[3] is None
+    assert tresult.avg1_area.values[4] is None
+    assert tresult.avg1_area.values[5] is None
+    assert tresult.avg2_area.values[5] is None
+    assert tresult.p_value.values[3] is None
+    assert tresult.p_value.values[4] is None
+    assert tresult.p_value.values[5] is None
+    assert tresult.p_value.values[0] is not None
+
+def testOnTablesWithWorkerProcesses():
+    from libms.Statistics.Anova import _MIN_IDS_FOR_POOL
+    ids = ["c%03d" % i for i in range(_MIN_IDS_FOR_POOL + 8)]
+    ids.reverse()
+    setOne, setTwo = [], []
+    for i in range(4):
+        t = ms.toTable("compound", ids)
+        t.addColumn("area", [1.0 + 0.1 * j + 0.03 * i for j in range(len(ids))])
+        setOne.append(t)
+        t = ms.toTable("compound", ids)
+        t.addColumn("area", [1.1 + 0.1 * j - 0.02 * i for j in range(len(ids))])
+        setTwo.append(t)
+
+    for statistics in [ms.oneWayAnovaOnTables, ms.kruskalWallisOnTables]:
+        serial = statistics(setOne, setTwo, idColumn="compound",
+                                             valueColumn="area")
+        parallel = statistics(setOne, setTwo, idColumn="compound",
+                                               valueColumn="area",
+                                               numProcesses=2)
+        assert serial.id.values == sorted(ids)
+        assert parallel.id.values == serial.id.values
+        assert parallel.p_value.values == serial.p_value.values
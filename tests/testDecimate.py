@@ -0,0 +1,33 @@
+import numpy as np
+from libms.Explorers.PlottingWidgets import decimate
+
+
+def testSmallInputUnchanged():
+    x = np.arange(100.0)
+    y = np.sin(x)
+    xd, yd = decimate(x, y, target=100)
+    assert np.all(xd == x)
+    assert np.all(yd == y)
+
+
+def testDecimate():
+    n = 10001
+    x = np.arange(n) * 0.5
+    y = np.random.RandomState(42).rand(n)
+    xd, yd = decimate(x, y, target=2000)
+
+    assert len(xd) < n
+    assert len(xd) == len(yd)
+    # end points are kept, so the x-range does not change:
+    assert xd[0] == x[0] and xd[-1] == x[-1]
+    assert yd[0] == y[0] and yd[-1] == y[-1]
+    # x stays sorted and points are taken from the input:
+    assert np.all(np.diff(xd) > 0)
+    assert np.all(y[(xd / 0.5).astype(int)] == yd)
+
+    # spikes remain visible: the maximum of each bucket is kept
+    k = int(np.ceil(2.0 * n / 2000))
+    kept = set(xd.tolist())
+    for start in range(0, n, k):
+        imax = start + np.argmax(y[start:start+k])
+        assert x[imax] in kept, start
@@ -29,3 +29,30 @@ def testMatchedFilter():
     assert len(table) == 340, len(table)
     assert len(table.getColNames()) ==  18, len(table.getColNames())
     assert len(table.getColTypes()) ==  18
+
+def testMzDataCache():
+    from libms.RConnect.XCMSConnector import _store_experiment
+
+    pm1 = ms.loadPeakMap("data/test_mini.mzXML")
+    pm2 = ms.loadPeakMap("data/test.mzXML")
+    # limit is smaller than any file, so only the latest file is kept:
+    ms.setMzDataCacheLimit(1e-6)
+    try:
+        path1 = _store_experiment(pm1, "temp_output")
+        inode = os.stat(path1).st_ino
+        assert os.path.dirname(path1) != os.path.abspath("temp_output")
+
+        # second call reuses the cached file:
+        assert _store_experiment(pm1, "temp_output") == path1
+        assert os.stat(path1).st_ino == inode
+
+        # storing another peakmap evicts the first file:
+        path2 = _store_experiment(pm2, "temp_output")
+        assert path2 != path1
+        assert os.path.exists(path2)
+        assert not os.path.exists(path1)
+    finally:
+        ms.setMzDataCacheLimit(0)
+
+    assert _store_experiment(pm1, "temp_output") == \
+            os.path.join("temp_output", "input.mzData")
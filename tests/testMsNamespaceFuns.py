@@ -60,3 +60,34 @@ def testAlignFeatureTables():
     assert osp.exists("temp_output/test_aligned.png")
 
 
+
+def testRecalculateMzPeaks():
+    from libms.DataStructures.MSTypes import PeakMap, Spectrum
+    # intensities are chosen such that the peaks have weights 1 and 2:
+    peaks = np.array([[100.0, np.e - 1.0],
+                      [100.2, np.e ** 2 - 1.0],
+                      [200.0, 5.0]])
+    pm = PeakMap([Spectrum(peaks, rt, 1, "0") for rt in (10.0, 20.0, 30.0)])
+
+    t = ms.toTable("mzmin", [99.9, 300.0])
+    t.addColumn("mzmax", [100.3, 301.0])
+    t.addColumn("rtmin", [5.0, 5.0])
+    t.addColumn("rtmax", [25.0, 25.0])
+    t.addColumn("peakmap", [pm, pm])
+    for name in ["mzmin", "mzmax", "rtmin", "rtmax", "peakmap"]:
+        t._addColumnWithoutNameCheck(name + "__0", t.getColumn(name))
+        t.addColumn(name + "_x", t.getColumn(name))
+    t._addColumnWithoutNameCheck("mz__0", [0.0, 0.0], int, "%d")
+
+    ms.recalculateMzPeaks(t)
+
+    for name in ["mz", "mz__0"]:
+        mz = t.getColumn(name).values
+        assert abs(mz[0] - 100.4 / 3.0 - 100.0) < 1e-8, mz[0]
+        # no peaks in range: use center of mz window
+        assert mz[1] == 300.5
+        assert t.getColType(name) == float
+        assert t.getColFormat(name) == "%.5f"
+
+    # only postfixes from joins are considered:
+    assert not t.hasColumn("mz_x")
@@ -22,3 +22,10 @@ def testMzAlign():
     assert tab_aligned.get(tab_aligned.colTypes, "mz") == float
     assert tab_aligned.get(tab_aligned.colTypes, "mzmin") == float
     assert tab_aligned.get(tab_aligned.colTypes, "mzmax") == float
+
+def testCarbonCount():
+    from ms._mzalign_helpers import _carbonCount
+    assert _carbonCount("C6H12O6") == 6
+    assert _carbonCount("CH4") == 1
+    assert _carbonCount("CCl4") == 1
+    assert _carbonCount("C2Ca") == 2
@@ -15,3 +15,9 @@ def test_XCMSParser():
     assert all(type(v) == float for v in table.rtmax.values)
 
     table.storeCSV("temp_output/test.csv")
+
+def test_XCMSParserFromFile():
+    table = XCMSFeatureParser.parseFile("data/xcms_output.csv")
+    lines = file("data/xcms_output.csv").readlines()
+    assert table.rows == XCMSFeatureParser.parse(lines).rows
+    assert table.getColTypes() == XCMSFeatureParser.parse(lines).getColTypes()
@@ -188,6 +188,39 @@ _pseudo_globals = dict()
 def setRVersion(r_version, g=_pseudo_globals):
     g["R_VERSION"] = r_version
 
+def _rVersionCachePath():
+    return os.path.join(getEmzedFolder(), "r_version.ini")
+
+def getCachedRVersion():
+    """ returns dict with keys 'r_exe', 'mtime' and 'version' or None """
+    path = _rVersionCachePath()
+    if not os.path.exists(path):
+        return None
+    try:
+        p = ConfigParser.ConfigParser()
+        with open(path) as fp:
+            p.readfp(fp)
+        return dict(r_exe=p.get("DEFAULT", "r_exe"),
+                    mtime=p.getfloat("DEFAULT", "mtime"),
+                    version=p.get("DEFAULT", "version"))
+    except (ConfigParser.Error, ValueError, IOError):
+        return None
+
+def setCachedRVersion(r_exe, mtime, r_version):
+    folder = getEmzedFolder()
+    try:
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        p = ConfigParser.ConfigParser()
+        p.set("DEFAULT", "r_exe", r_exe)
+        p.set("DEFAULT", "mtime", repr(mtime))
+        p.set("DEFAULT", "version", r_version)
+        with open(_rVersionCachePath(), "w") as fp:
+            p.write(fp)
+    except (IOError, OSError):
+        # cache is optional
+        pass
+
 def getRLibsFolder(g=_pseudo_globals):
     r_version = g.get("R_VERSION")
     if r_version is None: